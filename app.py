@@ -11,6 +11,9 @@ from datetime import datetime
 from dotenv import load_dotenv
 import time
 
+import retrieval_client
+from conversation_memory import ConversationMemory
+
 # Charger les variables d'environnement
 load_dotenv()
 
@@ -98,15 +101,10 @@ AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
 AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
 AZURE_DEPLOYMENT_NAME = os.getenv("AZURE_DEPLOYMENT_NAME", "gpt-4")
 
-AZURE_SEARCH_ENDPOINT = os.getenv("AZURE_SEARCH_ENDPOINT")
-AZURE_SEARCH_KEY = os.getenv("AZURE_SEARCH_KEY")
-AZURE_SEARCH_INDEX = os.getenv("AZURE_SEARCH_INDEX")
-AZURE_SEARCH_API_VERSION = os.getenv("AZURE_SEARCH_API_VERSION", "2023-07-01-Preview")
+# Nombre de messages de la conversation affichés par défaut
+CHAT_DISPLAY_MESSAGES = int(os.getenv("CHAT_DISPLAY_MESSAGES", "20"))
 
-AZURE_EMBEDDING_ENDPOINT = os.getenv("AZURE_EMBEDDING_ENDPOINT")
-AZURE_EMBEDDING_API_KEY = os.getenv("AZURE_EMBEDDING_API_KEY")
-AZURE_EMBEDDING_API_VERSION = os.getenv("AZURE_EMBEDDING_API_VERSION")
-AZURE_EMBEDDING_DEPLOYMENT = os.getenv("AZURE_EMBEDDING_DEPLOYMENT", "text-embedding-ada-002")
+# La recherche (embeddings, index) est déléguée au service partagé retrieval_service.py
 
 # Fonctions utilitaires
 def status_indicator(message, status=None, show_spinner=False):
@@ -165,124 +163,29 @@ def extract_text_from_file(file):
         st.error(f"❌ Type de fichier non pris en charge: {file_type}. Seuls les formats PDF, DOCX, TXT, MD et HTML sont acceptés.")
         return ""
 
-def generate_embedding(text):
-    """Générer un embedding pour le texte via Azure OpenAI"""
-    try:
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": AZURE_EMBEDDING_API_KEY
-        }
-        
-        # Tronquer le texte si nécessaire (limite d'Azure OpenAI)
-        max_tokens = 8191
-        truncated_text = text[:max_tokens * 4]  # Approximation grossière
-        
-        payload = {
-            "input": truncated_text,
-            "model": AZURE_EMBEDDING_DEPLOYMENT
-        }
-        
-        response = requests.post(
-            AZURE_EMBEDDING_ENDPOINT,
-            headers=headers,
-            json=payload
-        )
-        
-        if response.status_code == 200:
-            return response.json()["data"][0]["embedding"]
-        else:
-            error_msg = response.text
-            st.error(f"❌ Erreur lors de la génération de l'embedding: Le service Azure OpenAI a retourné une erreur (code {response.status_code}). Vérifiez votre configuration API et votre quota. Détails: {error_msg}")
-            return None
-    except requests.exceptions.ConnectionError:
-        st.error("❌ Erreur de connexion: Impossible de se connecter au service Azure OpenAI. Vérifiez votre connexion internet et l'URL du point de terminaison.")
-        return None
-    except requests.exceptions.Timeout:
-        st.error("❌ Délai d'attente dépassé: Le service Azure OpenAI n'a pas répondu à temps. Réessayez plus tard.")
-        return None
-    except Exception as e:
-        st.error(f"❌ Erreur inattendue lors de la génération de l'embedding: {str(e)}")
-        return None
-
-def store_in_azure_search(doc_id, content, embedding, model_id):
-    """Stocker le contenu et son embedding dans Azure Cognitive Search"""
+def index_documents(model_id, documents):
+    """Indexer en une fois les documents d'un téléversement via le service de recherche partagé"""
     try:
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": AZURE_SEARCH_KEY
-        }
-        
-        # Adapté à la structure réelle de l'index
-        document = {
-            "id": doc_id,
-            "content": content,
-            "embedding": embedding
-        }
-        
-        response = requests.post(
-            f"{AZURE_SEARCH_ENDPOINT}/indexes/{AZURE_SEARCH_INDEX}/docs/index?api-version={AZURE_SEARCH_API_VERSION}",
-            headers=headers,
-            json={"value": [document]}
-        )
-        
-        if response.status_code in [200, 201, 204]:
-            return True
-        else:
-            error_content = response.text
-            st.error(f"❌ Erreur lors de l'enregistrement dans Azure Search (code {response.status_code}): Vérifiez que l'index '{AZURE_SEARCH_INDEX}' existe et qu'il contient bien le champ 'embedding'. Détails: {error_content}")
-            return False
-    except requests.exceptions.ConnectionError:
-        st.error(f"❌ Erreur de connexion: Impossible de se connecter au service Azure Cognitive Search. Vérifiez votre connexion internet et l'URL du point de terminaison ({AZURE_SEARCH_ENDPOINT}).")
-        return False
-    except Exception as e:
-        st.error(f"❌ Erreur inattendue lors de l'enregistrement dans Azure Search: {str(e)}")
+        retrieval_client.index_documents(model_id, documents)
+        return True
+    except retrieval_client.RetrievalServiceError as e:
+        st.error(f"❌ Erreur lors de l'indexation des documents: {str(e)}")
         return False
 
-def search_in_azure_search(query_embedding, top=3):
-    """Rechercher les documents pertinents dans Azure Cognitive Search"""
+def search_documents(model_id, query, top=3):
+    """Rechercher les documents pertinents via le service de recherche partagé"""
     try:
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": AZURE_SEARCH_KEY
-        }
-        
-        # Adapté à la structure réelle de l'index
-        payload = {
-            "vectorQueries": [
-                {
-                    "kind": "vector",
-                    "vector": query_embedding,
-                    "fields": "embedding",
-                    "k": top
-                }
-            ],
-            "select": "content"
-        }
-        
-        response = requests.post(
-            f"{AZURE_SEARCH_ENDPOINT}/indexes/{AZURE_SEARCH_INDEX}/docs/search?api-version={AZURE_SEARCH_API_VERSION}",
-            headers=headers,
-            json=payload
-        )
-        
-        if response.status_code == 200:
-            results = response.json().get("value", [])
-            if not results:
-                st.warning("⚠️ Aucun document pertinent trouvé pour cette requête. Essayez de reformuler votre question ou d'ajouter plus de documents.")
-            return [result["content"] for result in results]
-        else:
-            error_content = response.text
-            st.error(f"❌ Erreur lors de la recherche dans Azure Search (code {response.status_code}): Vérifiez que l'index est correctement configuré pour les recherches vectorielles. Détails: {error_content}")
-            return []
-    except requests.exceptions.ConnectionError:
-        st.error("❌ Erreur de connexion: Impossible de se connecter au service Azure Cognitive Search. Vérifiez votre connexion internet et l'URL du point de terminaison.")
-        return []
-    except Exception as e:
-        st.error(f"❌ Erreur inattendue lors de la recherche dans Azure Search: {str(e)}")
-        return []
+        results = retrieval_client.search(model_id, query, top=top)
+    except retrieval_client.RetrievalServiceError as e:
+        st.error(f"❌ Erreur lors de la recherche dans la documentation: {str(e)}")
+        return None
+
+    if not results:
+        st.warning("⚠️ Aucun document pertinent trouvé pour cette requête. Essayez de reformuler votre question ou d'ajouter plus de documents.")
+    return results
 
-def get_chat_completion(messages):
-    """Obtenir une réponse de GPT-4 via Azure OpenAI"""
+def request_chat_completion(messages, temperature=0.7, max_tokens=800):
+    """Appeler GPT-4 via Azure OpenAI, retourne None en cas d'erreur"""
     try:
         headers = {
             "Content-Type": "application/json",
@@ -292,8 +195,8 @@ def get_chat_completion(messages):
         payload = {
             "messages": messages,
             "model": AZURE_DEPLOYMENT_NAME,
-            "temperature": 0.7,
-            "max_tokens": 800
+            "temperature": temperature,
+            "max_tokens": max_tokens
         }
         
         response = requests.post(
@@ -307,16 +210,20 @@ def get_chat_completion(messages):
         else:
             error_content = response.text
             st.error(f"❌ Erreur lors de l'appel à Azure OpenAI (code {response.status_code}): Vérifiez que le modèle '{AZURE_DEPLOYMENT_NAME}' existe dans votre déploiement. Détails: {error_content}")
-            return "Désolé, je n'ai pas pu générer une réponse en raison d'un problème avec le service Azure OpenAI. Veuillez consulter les messages d'erreur pour plus d'informations."
+            return None
     except requests.exceptions.ConnectionError:
         st.error(f"❌ Erreur de connexion: Impossible de se connecter au service Azure OpenAI à l'adresse {AZURE_OPENAI_ENDPOINT}. Vérifiez votre connexion internet et l'URL du point de terminaison.")
-        return "Désolé, je n'ai pas pu générer une réponse en raison d'un problème de connexion au service Azure OpenAI."
+        return None
     except requests.exceptions.Timeout:
         st.error("❌ Délai d'attente dépassé: Le service Azure OpenAI n'a pas répondu à temps. Réessayez plus tard.")
-        return "Désolé, le temps de réponse du service Azure OpenAI est trop long. Veuillez réessayer plus tard."
+        return None
     except Exception as e:
         st.error(f"❌ Erreur inattendue lors de l'appel à Azure OpenAI: {str(e)}")
-        return "Désolé, une erreur inattendue est survenue lors de la génération de la réponse. Veuillez réessayer ou contacter l'administrateur."
+        return None
+
+def complete_for_memory(messages, max_tokens):
+    """Appel court et déterministe à GPT-4 pour la mémoire de conversation (résumé, reformulation)"""
+    return request_chat_completion(messages, temperature=0, max_tokens=max_tokens)
 
 def get_models():
     """Récupérer la liste des modèles disponibles"""
@@ -359,6 +266,14 @@ def save_model(model_name, instructions):
         "created_at": created_at
     }
     
+    # Déclarer le modèle auprès du service de recherche : sa recherche reste limitée
+    # à ses propres documents, même si aucun n'a pu être indexé
+    try:
+        retrieval_client.create_model(model_id)
+    except retrieval_client.RetrievalServiceError as e:
+        st.error(f"❌ Erreur lors de l'enregistrement du modèle auprès du service de recherche: {str(e)}")
+        return None
+    
     try:
         with open(os.path.join(MODELS_DIR, f"{model_id}.json"), "w") as f:
             json.dump(model_data, f, indent=2)
@@ -370,6 +285,43 @@ def save_model(model_name, instructions):
         st.error(f"❌ Erreur lors de l'enregistrement du modèle: {str(e)}")
         return None
 
+def delete_model(model):
+    """Supprimer un modèle et tous ses documents indexés"""
+    try:
+        deleted = retrieval_client.delete_model(model["id"])
+    except retrieval_client.RetrievalServiceError as e:
+        st.error(f"❌ Erreur lors de la suppression des documents du modèle '{model['name']}': {str(e)}")
+        return None
+
+    try:
+        os.remove(os.path.join(MODELS_DIR, f"{model['id']}.json"))
+    except FileNotFoundError:
+        pass
+    except PermissionError:
+        st.error(f"❌ Erreur de permission: Impossible de supprimer le modèle dans le dossier 'models'. Vérifiez les droits d'accès au répertoire {MODELS_DIR}.")
+        return None
+    except Exception as e:
+        st.error(f"❌ Erreur lors de la suppression du modèle: {str(e)}")
+        return None
+    return deleted
+
+def list_documents(model_id):
+    """Récupérer la liste des documents indexés pour un modèle"""
+    try:
+        return retrieval_client.list_documents(model_id)
+    except retrieval_client.RetrievalServiceError as e:
+        st.error(f"❌ Erreur lors de la récupération des documents du modèle: {str(e)}")
+        return []
+
+def remove_document(model_id, doc_id):
+    """Retirer un document de l'index d'un modèle"""
+    try:
+        retrieval_client.delete_documents(model_id, [doc_id])
+        return True
+    except retrieval_client.RetrievalServiceError as e:
+        st.error(f"❌ Erreur lors de la suppression du document: {str(e)}")
+        return False
+
 def create_model_ui():
     """Interface utilisateur pour créer un modèle personnalisé"""
     st.markdown("<h2 class='text-xl font-bold mb-4'>📄 Création d'un modèle d'assistance pour maladies rares</h2>", unsafe_allow_html=True)
@@ -439,6 +391,7 @@ def create_model_ui():
             
             progress_text = st.empty()
             progress_bar = st.progress(0)
+            documents = []
             
             for i, file in enumerate(uploaded_files):
                 progress_text.markdown(status_indicator(f"Traitement de {file.name}", show_spinner=True), unsafe_allow_html=True)
@@ -450,29 +403,118 @@ def create_model_ui():
                     time.sleep(1)
                     continue
                 
-                # Génération de l'embedding
-                embedding = generate_embedding(text)
-                if not embedding:
-                    progress_text.markdown(status_indicator(f"Échec de la génération d'embedding pour {file.name}", status=False), unsafe_allow_html=True)
-                    time.sleep(1)
-                    continue
-                
-                # Stockage dans Azure Search
-                doc_id = f"{model_id}_{i}_{uuid.uuid4()}"
-                success = store_in_azure_search(doc_id, text, embedding, model_id)
-                
-                if success:
-                    progress_text.markdown(status_indicator(f"Fichier {file.name} traité avec succès", status=True), unsafe_allow_html=True)
-                else:
-                    progress_text.markdown(status_indicator(f"Échec du stockage de {file.name}", status=False), unsafe_allow_html=True)
-                
+                documents.append({
+                    "doc_id": f"{model_id}_{i}_{uuid.uuid4()}",
+                    "name": file.name,
+                    "content": text
+                })
+                progress_text.markdown(status_indicator(f"Fichier {file.name} extrait avec succès", status=True), unsafe_allow_html=True)
                 progress_bar.progress((i + 1) / len(uploaded_files))
-                time.sleep(0.5)
+            
+            # Génération des embeddings et indexation en un seul appel au service de recherche
+            if documents:
+                progress_text.markdown(status_indicator(f"Indexation de {len(documents)} document(s)", show_spinner=True), unsafe_allow_html=True)
+                if index_documents(model_id, documents):
+                    progress_text.markdown(status_indicator(f"{len(documents)} document(s) indexé(s) avec succès", status=True), unsafe_allow_html=True)
+                else:
+                    progress_text.markdown(status_indicator("Échec de l'indexation des documents", status=False), unsafe_allow_html=True)
             
             st.success(f"✅ Modèle '{model_name}' créé avec succès ! Vous pouvez maintenant l'utiliser pour discuter de vos documents médicaux.")
             time.sleep(2)
             st.rerun()
 
+def render_message(message):
+    """Afficher un message de la conversation"""
+    if message["role"] == "user":
+        st.markdown(f"""
+        <div class="message-container user-message">
+            <p><strong>Vous :</strong> {message['content']}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        st.markdown(f"""
+        <div class="message-container assistant-message">
+            <p><strong>Assistant médical :</strong> {message['content']}</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+def get_conversation(model_id):
+    """Récupérer la mémoire de conversation associée à un modèle"""
+    if "conversations" not in st.session_state:
+        st.session_state.conversations = {}
+    if model_id not in st.session_state.conversations:
+        st.session_state.conversations[model_id] = ConversationMemory()
+    return st.session_state.conversations[model_id]
+
+def answer_question(selected_model, memory, user_input):
+    """Rechercher la documentation et générer la réponse à une question"""
+    with st.spinner("Recherche dans la documentation médicale..."):
+        # Reformuler les questions de suivi ("et chez l'enfant ?") avant la recherche
+        query = memory.standalone_query(user_input, complete_for_memory)
+        
+        # Rechercher les documents pertinents (embedding calculé par le service)
+        relevant_docs = search_documents(selected_model["id"], query)
+        
+        if relevant_docs is None:
+            memory.add_turn(user_input, "Désolé, je n'ai pas pu traiter votre question. Il semble y avoir un problème technique. Veuillez réessayer plus tard.", complete_for_memory, remember=False)
+            return
+        
+        if not relevant_docs:
+            memory.add_turn(user_input, "Désolé, je n'ai pas trouvé d'informations pertinentes sur cette maladie rare dans les documents fournis. Pourriez-vous reformuler votre question ou consulter un professionnel de santé ?", complete_for_memory, remember=False)
+            return
+        
+        # Préparer le contexte pour GPT-4
+        context = "\n\n".join(relevant_docs)
+        
+        # Construire le prompt pour GPT-4 : résumé et derniers échanges de la conversation
+        messages = memory.prompt_messages(
+            f"{selected_model['instructions']}\n\nUtilise ces informations médicales pour répondre à la question de l'utilisateur sur cette maladie rare:\n{context}",
+            user_input
+        )
+        
+        # Obtenir la réponse de GPT-4
+        response = request_chat_completion(messages)
+        if response is None:
+            memory.add_turn(user_input, "Désolé, je n'ai pas pu générer une réponse en raison d'un problème avec le service Azure OpenAI. Veuillez consulter les messages d'erreur pour plus d'informations.", complete_for_memory, remember=False)
+            return
+        
+        memory.add_turn(user_input, response, complete_for_memory)
+
+@st.fragment
+def chat_fragment(selected_model, memory):
+    """Historique et saisie des questions : seul ce fragment est réexécuté à chaque envoi.
+
+    Seuls les CHAT_DISPLAY_MESSAGES derniers messages sont affichés, quelle que
+    soit la longueur de la session ; les précédents ne sont dessinés que si
+    l'utilisateur le demande.
+    """
+    messages = list(memory.messages)
+    older, recent = messages[:-CHAT_DISPLAY_MESSAGES], messages[-CHAT_DISPLAY_MESSAGES:]
+    
+    if older and st.toggle(f"Afficher les {len(older)} messages précédents", key=f"show_older_{selected_model['id']}"):
+        for message in older:
+            render_message(message)
+    
+    for message in recent:
+        render_message(message)
+    
+    # Zone de saisie utilisateur
+    user_input = st.text_area("Votre question sur cette maladie rare :", 
+                              height=100, 
+                              key="user_question",
+                              placeholder="Ex: Quels sont les symptômes principaux de cette maladie ? Y a-t-il des traitements disponibles ?")
+    
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col2:
+        submit_button = st.button("📨 Envoyer ma question", 
+                                  use_container_width=True, 
+                                  type="primary",
+                                  key="send_button")
+    
+    if submit_button and user_input:
+        answer_question(selected_model, memory, user_input)
+        st.rerun(scope="fragment")
+
 def chat_model_ui():
     """Interface utilisateur pour interagir avec un modèle"""
     st.markdown("<h2 class='text-xl font-bold mb-4'>💬 Discuter avec votre assistant médical</h2>", unsafe_allow_html=True)
@@ -495,87 +537,62 @@ def chat_model_ui():
         </div>
         """, unsafe_allow_html=True)
         
-        # Initialiser l'historique de conversation s'il n'existe pas
-        if "chat_history" not in st.session_state:
-            st.session_state.chat_history = []
+        # Une mémoire de conversation par modèle
+        memory = get_conversation(selected_model["id"])
         
-        # Zone pour afficher l'historique des messages
-        chat_container = st.container()
-        with chat_container:
-            for message in st.session_state.chat_history:
-                if message["role"] == "user":
-                    st.markdown(f"""
-                    <div class="message-container user-message">
-                        <p><strong>Vous :</strong> {message['content']}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    st.markdown(f"""
-                    <div class="message-container assistant-message">
-                        <p><strong>Assistant médical :</strong> {message['content']}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-        
-        # Zone de saisie utilisateur
-        user_input = st.text_area("Votre question sur cette maladie rare :", 
-                                  height=100, 
-                                  key="user_question",
-                                  placeholder="Ex: Quels sont les symptômes principaux de cette maladie ? Y a-t-il des traitements disponibles ?")
-        
-        col1, col2, col3 = st.columns([1, 1, 1])
+        chat_fragment(selected_model, memory)
+
+def manage_models_ui():
+    """Interface utilisateur pour supprimer des modèles et leurs documents"""
+    st.markdown("<h2 class='text-xl font-bold mb-4'>🗂️ Gérer les modèles d'assistance</h2>", unsafe_allow_html=True)
+    
+    models = get_models()
+    if not models:
+        return
+    
+    model_names = [model["name"] for model in models]
+    selected_model_name = st.selectbox("Choisir un modèle à gérer", model_names, key="manage_model")
+    
+    selected_model = next((model for model in models if model["name"] == selected_model_name), None)
+    if not selected_model:
+        return
+    
+    # Documents indexés pour ce modèle
+    st.markdown("<h3 class='font-bold text-gray-700 mb-2'>📚 Documents indexés</h3>", unsafe_allow_html=True)
+    documents = list_documents(selected_model["id"])
+    if not documents:
+        st.info("ℹ️ Aucun document indexé pour ce modèle.")
+    
+    for document in documents:
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.markdown(f"<p class='text-sm text-gray-700'>📄 {document['name']}</p>", unsafe_allow_html=True)
         with col2:
-            submit_button = st.button("📨 Envoyer ma question", 
-                                      use_container_width=True, 
-                                      type="primary",
-                                      key="send_button")
-        
-        if submit_button:
-            if user_input:
-                # Ajouter la question à l'historique
-                st.session_state.chat_history.append({
-                    "role": "user",
-                    "content": user_input
-                })
-                
-                with st.spinner("Recherche dans la documentation médicale..."):
-                    # Générer l'embedding de la question
-                    query_embedding = generate_embedding(user_input)
-                    
-                    if query_embedding:
-                        # Rechercher les documents pertinents
-                        # Modification: on ne filtre plus par model_id car ce champ n'existe pas dans l'index
-                        relevant_docs = search_in_azure_search(query_embedding)
-                        
-                        if relevant_docs:
-                            # Préparer le contexte pour GPT-4
-                            context = "\n\n".join(relevant_docs)
-                            
-                            # Construire le prompt pour GPT-4
-                            messages = [
-                                {"role": "system", "content": f"{selected_model['instructions']}\n\nUtilise ces informations médicales pour répondre à la question de l'utilisateur sur cette maladie rare:\n{context}"},
-                                {"role": "user", "content": user_input}
-                            ]
-                            
-                            # Obtenir la réponse de GPT-4
-                            response = get_chat_completion(messages)
-                            
-                            # Ajouter la réponse à l'historique
-                            st.session_state.chat_history.append({
-                                "role": "assistant",
-                                "content": response
-                            })
-                        else:
-                            st.session_state.chat_history.append({
-                                "role": "assistant",
-                                "content": "Désolé, je n'ai pas trouvé d'informations pertinentes sur cette maladie rare dans les documents fournis. Pourriez-vous reformuler votre question ou consulter un professionnel de santé ?"
-                            })
-                    else:
-                        st.session_state.chat_history.append({
-                            "role": "assistant",
-                            "content": "Désolé, je n'ai pas pu traiter votre question. Il semble y avoir un problème technique. Veuillez réessayer plus tard."
-                        })
-                
-                st.rerun()
+            if st.button("🗑️ Retirer", key=f"remove_{document['id']}", use_container_width=True):
+                if remove_document(selected_model["id"], document["id"]):
+                    st.success(f"✅ Document '{document['name']}' retiré du modèle.")
+                    time.sleep(1)
+                    st.rerun()
+    
+    # Suppression du modèle
+    st.markdown("<h3 class='font-bold text-red-700 mt-4 mb-2'>⚠️ Supprimer le modèle</h3>", unsafe_allow_html=True)
+    confirm = st.checkbox(f"Je confirme vouloir supprimer le modèle '{selected_model['name']}' et tous ses documents", key=f"confirm_delete_{selected_model['id']}")
+    
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col2:
+        delete_button = st.button("🗑️ Supprimer le modèle",
+                                  use_container_width=True,
+                                  type="primary",
+                                  disabled=not confirm,
+                                  key="delete_model_button")
+    
+    if delete_button:
+        with st.spinner("Suppression du modèle en cours..."):
+            deleted = delete_model(selected_model)
+        if deleted is not None:
+            st.success(f"✅ Modèle '{selected_model['name']}' supprimé ({deleted} documents retirés de l'index).")
+            time.sleep(2)
+            st.rerun()
 
 # Interface principale
 def main():
@@ -589,10 +606,10 @@ def main():
     config_errors = []
     if not AZURE_OPENAI_ENDPOINT or not AZURE_OPENAI_API_KEY:
         config_errors.append("⚠️ Azure OpenAI n'est pas configuré correctement. Vérifiez les variables AZURE_OPENAI_ENDPOINT et AZURE_OPENAI_API_KEY dans le fichier .env")
-    if not AZURE_SEARCH_ENDPOINT or not AZURE_SEARCH_KEY or not AZURE_SEARCH_INDEX:
-        config_errors.append("⚠️ Azure Cognitive Search n'est pas configuré correctement. Vérifiez les variables AZURE_SEARCH_ENDPOINT, AZURE_SEARCH_KEY et AZURE_SEARCH_INDEX dans le fichier .env")
-    if not AZURE_EMBEDDING_ENDPOINT or not AZURE_EMBEDDING_API_KEY:
-        config_errors.append("⚠️ Azure Embedding n'est pas configuré correctement. Vérifiez les variables AZURE_EMBEDDING_ENDPOINT et AZURE_EMBEDDING_API_KEY dans le fichier .env")
+    try:
+        retrieval_client.health()
+    except retrieval_client.RetrievalServiceError as e:
+        config_errors.append(f"⚠️ Le service de recherche n'est pas disponible. {str(e)}")
     
     if config_errors:
         st.error("⚠️ Configuration incomplète des services Azure:")
@@ -603,7 +620,8 @@ def main():
         1. Créez un fichier .env à la racine du projet
         2. Copiez le contenu du fichier .env.example
         3. Remplacez les valeurs par vos propres clés et points de terminaison Azure
-        4. Redémarrez l'application
+        4. Lancez le service de recherche : python retrieval_service.py
+        5. Redémarrez l'application
         """)
         return
     
@@ -617,14 +635,17 @@ def main():
                 <li>Créer un assistant IA pour comprendre des documents médicaux</li>
                 <li>Poser des questions sur des maladies rares</li>
                 <li>Obtenir des explications claires et précises</li>
+                <li>Supprimer des modèles ou des documents devenus inutiles</li>
             </ul>
         </div>
         """, unsafe_allow_html=True)
         
-        tab = st.radio("Navigation", ["📄 Créer un modèle", "💬 Discuter avec un modèle"], label_visibility="collapsed")
+        tab = st.radio("Navigation", ["📄 Créer un modèle", "💬 Discuter avec un modèle", "🗂️ Gérer les modèles"], label_visibility="collapsed")
     
     if tab == "📄 Créer un modèle":
         create_model_ui()
+    elif tab == "🗂️ Gérer les modèles":
+        manage_models_ui()
     else:
         chat_model_ui()
 
@@ -0,0 +1,130 @@
+"""Mémoire de conversation bornée pour l'assistant médical.
+
+Seuls les derniers échanges sont conservés tels quels ; les plus anciens sont
+condensés dans un résumé glissant. Le coût d'un tour (prompt, reformulation de
+la question) reste ainsi constant quelle que soit la longueur de la session.
+
+Les appels au modèle de langage passent par une fonction `complete(messages,
+max_tokens)` fournie par l'appelant, qui retourne le texte généré ou None.
+"""
+import os
+from collections import deque
+
+MEMORY_WINDOW_TURNS = int(os.getenv("MEMORY_WINDOW_TURNS", "4"))
+MEMORY_SUMMARY_MAX_TOKENS = int(os.getenv("MEMORY_SUMMARY_MAX_TOKENS", "300"))
+MEMORY_TRANSCRIPT_MESSAGES = int(os.getenv("MEMORY_TRANSCRIPT_MESSAGES", "200"))
+# Longueur des réponses recopiées dans le résumé quand il n'a pas pu être généré
+FALLBACK_ANSWER_CHARS = 300
+
+SUMMARY_PROMPT = (
+    "Tu maintiens le résumé d'une conversation médicale sur une maladie rare. "
+    "Intègre les nouveaux échanges au résumé existant en conservant les faits importants "
+    "(maladie, patient, symptômes, traitements, âges, questions restées ouvertes). "
+    "Réponds uniquement par le nouveau résumé, en quelques phrases."
+)
+
+REWRITE_PROMPT = (
+    "Reformule la dernière question de l'utilisateur en une question autonome, compréhensible "
+    "sans la conversation, en explicitant la maladie ou le sujet auquel elle fait référence. "
+    "Si elle est déjà autonome, renvoie-la telle quelle. Réponds uniquement par la question."
+)
+
+
+def _format_turns(turns):
+    return "\n".join(f"Utilisateur : {question}\nAssistant : {answer}" for question, answer in turns)
+
+
+class ConversationMemory:
+    """Historique d'une conversation avec un modèle d'assistance"""
+
+    def __init__(self, max_turns=MEMORY_WINDOW_TURNS, summary_max_tokens=MEMORY_SUMMARY_MAX_TOKENS,
+                 transcript_messages=MEMORY_TRANSCRIPT_MESSAGES):
+        self.max_turns = max_turns
+        self.summary_max_tokens = summary_max_tokens
+        # Transcription des derniers messages, utilisée uniquement pour l'affichage
+        self.messages = deque(maxlen=transcript_messages)
+        # Derniers échanges (question, réponse) et résumé des plus anciens
+        self.turns = deque()
+        self.summary = ""
+
+    def _context(self):
+        context = ""
+        if self.summary:
+            context += f"Résumé des échanges précédents :\n{self.summary}\n\n"
+        if self.turns:
+            context += f"Derniers échanges :\n{_format_turns(self.turns)}\n\n"
+        return context
+
+    def standalone_query(self, question, complete):
+        """Reformuler une question de suivi en requête autonome pour la recherche"""
+        if not self.turns and not self.summary:
+            return question
+
+        messages = [
+            {"role": "system", "content": REWRITE_PROMPT},
+            {"role": "user", "content": f"{self._context()}Dernière question : {question}"}
+        ]
+        rewritten = complete(messages, 200)
+        return rewritten.strip() if rewritten else question
+
+    def prompt_messages(self, system_prompt, question):
+        """Construire les messages envoyés au modèle : résumé, derniers échanges et question"""
+        if self.summary:
+            system_prompt = f"{system_prompt}\n\nRésumé des échanges précédents avec l'utilisateur :\n{self.summary}"
+
+        messages = [{"role": "system", "content": system_prompt}]
+        for previous_question, previous_answer in self.turns:
+            messages.append({"role": "user", "content": previous_question})
+            messages.append({"role": "assistant", "content": previous_answer})
+        messages.append({"role": "user", "content": question})
+        return messages
+
+    def add_turn(self, question, answer, complete, remember=True):
+        """Enregistrer un échange et condenser les plus anciens si la fenêtre est pleine.
+
+        Avec remember=False (réponse d'erreur), l'échange est seulement affiché et
+        n'entre ni dans le prompt ni dans le résumé.
+        """
+        self.messages.append({"role": "user", "content": question})
+        self.messages.append({"role": "assistant", "content": answer})
+        if not remember:
+            return
+        self.turns.append((question, answer))
+
+        if len(self.turns) > self.max_turns:
+            # Condenser la moitié de la fenêtre d'un coup : un appel de résumé tous les
+            # max_turns / 2 échanges au lieu d'un par échange
+            self._fold(len(self.turns) - self.max_turns // 2, complete)
+
+    def _fold(self, count, complete):
+        """Condenser les `count` plus anciens échanges dans le résumé.
+
+        Ils ne quittent la fenêtre qu'une fois le résumé obtenu ; en cas d'échec,
+        la condensation est retentée au tour suivant. Si les échecs se répètent,
+        la fenêtre reste plafonnée à deux fois sa taille normale : les échanges
+        en excès sont ajoutés tels quels (réponses tronquées) à la fin du résumé,
+        qui sera réécrit par le prochain résumé réussi.
+        """
+        evicted = list(self.turns)[:count]
+        messages = [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": f"Résumé existant :\n{self.summary or '(aucun)'}\n\nNouveaux échanges :\n{_format_turns(evicted)}"}
+        ]
+        summary = complete(messages, self.summary_max_tokens)
+        if summary:
+            self.summary = summary.strip()
+            for _ in range(count):
+                self.turns.popleft()
+            return
+
+        overflow = []
+        while len(self.turns) > 2 * self.max_turns:
+            question, answer = self.turns.popleft()
+            if len(answer) > FALLBACK_ANSWER_CHARS:
+                answer = answer[:FALLBACK_ANSWER_CHARS] + "…"
+            overflow.append((question, answer))
+        if overflow:
+            summary = f"{self.summary}\n{_format_turns(overflow)}".strip()
+            # Même ordre de grandeur qu'un résumé généré (environ 4 caractères par token) ;
+            # les échanges les plus récents sont conservés
+            self.summary = summary[-self.summary_max_tokens * 4:]
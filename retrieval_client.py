@@ -0,0 +1,81 @@
+"""Client léger du service de recherche partagé (voir `retrieval_service.py`)"""
+import os
+
+import requests
+from dotenv import load_dotenv
+
+# Charger les variables d'environnement
+load_dotenv()
+
+RETRIEVAL_SERVICE_URL = os.getenv("RETRIEVAL_SERVICE_URL", "http://127.0.0.1:8765")
+# Doit rester supérieur à l'échéance des embeddings (EMBEDDING_DEADLINE) augmentée du
+# délai Azure Cognitive Search (AZURE_SEARCH_TIMEOUT), sinon une indexation lente se
+# poursuit côté service après l'abandon du client
+RETRIEVAL_TIMEOUT = float(os.getenv("RETRIEVAL_TIMEOUT", "120"))
+
+
+class RetrievalServiceError(Exception):
+    """Erreur retournée par le service de recherche ou lors de son appel"""
+
+
+def _request(method, path, payload=None):
+    try:
+        response = requests.request(
+            method,
+            f"{RETRIEVAL_SERVICE_URL}{path}",
+            json=payload,
+            timeout=RETRIEVAL_TIMEOUT
+        )
+    except requests.exceptions.ConnectionError:
+        raise RetrievalServiceError(f"Impossible de se connecter au service de recherche à l'adresse {RETRIEVAL_SERVICE_URL}. Vérifiez qu'il est lancé (python retrieval_service.py).")
+    except requests.exceptions.Timeout:
+        raise RetrievalServiceError("Le service de recherche n'a pas répondu à temps. Réessayez plus tard.")
+
+    try:
+        body = response.json()
+    except ValueError:
+        raise RetrievalServiceError(f"Réponse invalide du service de recherche (code {response.status_code}): {response.text}")
+
+    if response.status_code != 200:
+        raise RetrievalServiceError(body.get("error", f"Erreur du service de recherche (code {response.status_code})"))
+    return body
+
+
+def health():
+    """Vérifier que le service de recherche répond"""
+    return _request("GET", "/health")
+
+
+def embed(texts):
+    """Générer les embeddings d'une liste de textes"""
+    return _request("POST", "/embed", {"texts": texts})["embeddings"]
+
+
+def create_model(model_id):
+    """Déclarer un nouveau modèle (sans document) auprès du service"""
+    _request("POST", "/create_model", {"model_id": model_id})
+
+
+def index_documents(model_id, documents):
+    """Indexer en une fois les documents d'un modèle ({"doc_id", "name", "content"})"""
+    _request("POST", "/index", {"model_id": model_id, "documents": documents})
+
+
+def search(model_id, query, top=3):
+    """Rechercher les passages les plus pertinents pour une question"""
+    return _request("POST", "/search", {"model_id": model_id, "query": query, "top": top})["results"]
+
+
+def list_documents(model_id):
+    """Lister les documents indexés pour un modèle ({"id", "name"})"""
+    return _request("POST", "/documents", {"model_id": model_id})["documents"]
+
+
+def delete_documents(model_id, doc_ids):
+    """Retirer des documents de l'index d'un modèle"""
+    _request("POST", "/delete_documents", {"model_id": model_id, "doc_ids": doc_ids})
+
+
+def delete_model(model_id):
+    """Retirer tous les documents d'un modèle de l'index"""
+    return _request("POST", "/delete_model", {"model_id": model_id})["deleted"]
@@ -0,0 +1,893 @@
+"""Service de recherche partagé entre toutes les sessions Streamlit.
+
+Le service tourne une fois par machine et concentre tout ce qui coûte de la
+mémoire ou des appels réseau : index vectoriels par modèle, cache d'embeddings
+et regroupement (batching) des appels au service d'embedding Azure OpenAI.
+Les sessions Streamlit l'interrogent via `retrieval_client.py`.
+
+Lancement :
+
+    python retrieval_service.py
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from queue import Empty, Queue
+
+import numpy as np
+import requests
+from cachetools import LRUCache
+from dotenv import load_dotenv
+
+# Charger les variables d'environnement
+load_dotenv()
+
+logger = logging.getLogger("retrieval_service")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Configuration du service
+RETRIEVAL_SERVICE_HOST = os.getenv("RETRIEVAL_SERVICE_HOST", "127.0.0.1")
+RETRIEVAL_SERVICE_PORT = int(os.getenv("RETRIEVAL_SERVICE_PORT", "8765"))
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", str(os.cpu_count() or 4)))
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "azure").lower()
+RETRIEVAL_INDEX_DIR = os.getenv("RETRIEVAL_INDEX_DIR", os.path.join(BASE_DIR, "indexes"))
+# Dossier des modèles de l'application, dont les registres sont reconstruits au démarrage
+RETRIEVAL_MODELS_DIR = os.getenv("RETRIEVAL_MODELS_DIR") or os.path.join(BASE_DIR, "models")
+COMPACTION_THRESHOLD = float(os.getenv("RETRIEVAL_COMPACTION_THRESHOLD", "0.2"))
+MAX_INDEX_SEGMENTS = int(os.getenv("RETRIEVAL_MAX_SEGMENTS", "8"))
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "16"))
+EMBEDDING_BATCH_WAIT = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "20")) / 1000
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", "30"))
+# Échéance globale d'un appel à embed() ; doit rester inférieure à RETRIEVAL_TIMEOUT côté client
+EMBEDDING_DEADLINE = float(os.getenv("EMBEDDING_DEADLINE", "45"))
+AZURE_SEARCH_TIMEOUT = float(os.getenv("AZURE_SEARCH_TIMEOUT", "30"))
+
+# Configuration Azure
+AZURE_SEARCH_ENDPOINT = os.getenv("AZURE_SEARCH_ENDPOINT")
+AZURE_SEARCH_KEY = os.getenv("AZURE_SEARCH_KEY")
+AZURE_SEARCH_INDEX = os.getenv("AZURE_SEARCH_INDEX")
+AZURE_SEARCH_API_VERSION = os.getenv("AZURE_SEARCH_API_VERSION", "2023-07-01-Preview")
+
+AZURE_EMBEDDING_ENDPOINT = os.getenv("AZURE_EMBEDDING_ENDPOINT")
+AZURE_EMBEDDING_API_KEY = os.getenv("AZURE_EMBEDDING_API_KEY")
+AZURE_EMBEDDING_DEPLOYMENT = os.getenv("AZURE_EMBEDDING_DEPLOYMENT", "text-embedding-ada-002")
+
+# Tronquer le texte si nécessaire (limite d'Azure OpenAI)
+MAX_EMBEDDING_TOKENS = 8191
+MAX_EMBEDDING_CHARS = MAX_EMBEDDING_TOKENS * 4  # Approximation grossière
+
+
+class RetrievalError(Exception):
+    """Erreur remontée au client avec un code HTTP et un message lisible"""
+
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
+
+
+# Embeddings
+class EmbeddingService:
+    """Cache LRU et regroupement des appels au service d'embedding Azure OpenAI.
+
+    Les requêtes simultanées des différents workers sont accumulées pendant
+    quelques millisecondes puis envoyées en un seul appel Azure. Jusqu'à
+    EMBEDDING_CONCURRENCY lots sont envoyés en parallèle. Les embeddings sont
+    retournés et mis en cache sous forme de tableaux float32.
+    """
+
+    def __init__(self, cache_size=EMBEDDING_CACHE_SIZE, batch_size=EMBEDDING_BATCH_SIZE, batch_wait=EMBEDDING_BATCH_WAIT,
+                 concurrency=EMBEDDING_CONCURRENCY, timeout=EMBEDDING_TIMEOUT, deadline=EMBEDDING_DEADLINE):
+        self.cache = LRUCache(maxsize=cache_size)
+        self.cache_lock = threading.Lock()
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.timeout = timeout
+        self.deadline = deadline
+        self.queue = Queue()
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embedding-request")
+        self.thread = threading.Thread(target=self._batch_loop, name="embedding-batcher", daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def _key(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def embed(self, texts, use_cache=True):
+        """Retourner les embeddings des textes, dans l'ordre.
+
+        Les documents indexés ne sont jamais réinterrogés : use_cache=False évite
+        qu'ils chassent les questions du cache.
+        """
+        texts = [text[:MAX_EMBEDDING_CHARS] for text in texts]
+        results = [None] * len(texts)
+        pending = []
+
+        with self.cache_lock:
+            for i, text in enumerate(texts):
+                embedding = self.cache.get(self._key(text)) if use_cache else None
+                if embedding is not None:
+                    results[i] = embedding
+                else:
+                    pending.append(i)
+
+        futures = []
+        for i in pending:
+            future = Future()
+            self.queue.put((texts[i], future, use_cache))
+            futures.append((i, future))
+
+        # Une seule échéance pour l'ensemble des textes, inférieure au délai du client
+        deadline = time.monotonic() + self.deadline
+        for i, future in futures:
+            try:
+                results[i] = future.result(timeout=max(0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                raise RetrievalError("Le service Azure OpenAI n'a pas répondu à temps. Réessayez plus tard.", status=504)
+        return results
+
+    def _batch_loop(self):
+        while True:
+            batch = [self.queue.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get(timeout=self.batch_wait))
+            except Empty:
+                pass
+            self.executor.submit(self._process_batch, batch)
+
+    def _process_batch(self, batch):
+        try:
+            embeddings = self._request_embeddings([text for text, _, _ in batch])
+        except Exception as e:
+            # Une entrée rejetée par Azure (400) ne doit pas faire échouer les autres requêtes
+            # du lot : chacune est renvoyée seule. Une limitation de débit (429) ou une panne
+            # (5xx, délai dépassé) toucherait tout autant chaque entrée : le lot échoue d'un bloc.
+            if len(batch) > 1 and isinstance(e, RetrievalError) and e.status == 400:
+                for item in batch:
+                    self.executor.submit(self._process_batch, [item])
+                return
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        with self.cache_lock:
+            for (text, _, use_cache), embedding in zip(batch, embeddings):
+                if use_cache:
+                    self.cache[self._key(text)] = embedding
+        for (_, future, _), embedding in zip(batch, embeddings):
+            future.set_result(embedding)
+
+    def _request_embeddings(self, texts):
+        headers = {
+            "Content-Type": "application/json",
+            "api-key": AZURE_EMBEDDING_API_KEY
+        }
+
+        payload = {
+            "input": texts,
+            "model": AZURE_EMBEDDING_DEPLOYMENT
+        }
+
+        try:
+            response = requests.post(AZURE_EMBEDDING_ENDPOINT, headers=headers, json=payload, timeout=self.timeout)
+        except requests.exceptions.Timeout:
+            raise RetrievalError("Le service Azure OpenAI n'a pas répondu à temps. Réessayez plus tard.", status=504)
+        except requests.exceptions.ConnectionError:
+            raise RetrievalError("Impossible de se connecter au service Azure OpenAI. Vérifiez votre connexion internet et l'URL du point de terminaison.", status=503)
+
+        if response.status_code in [400, 413]:
+            raise RetrievalError(f"Le service Azure OpenAI a refusé le texte à vectoriser (code {response.status_code}). Détails: {response.text}", status=400)
+        if response.status_code == 429:
+            raise RetrievalError("Le quota du service Azure OpenAI est momentanément atteint. Réessayez dans quelques instants.", status=429)
+        if response.status_code != 200:
+            raise RetrievalError(f"Le service Azure OpenAI a retourné une erreur (code {response.status_code}). Vérifiez votre configuration API et votre quota. Détails: {response.text}", status=502)
+
+        try:
+            data = sorted(response.json()["data"], key=lambda item: item["index"])
+        except (ValueError, KeyError, TypeError):
+            raise RetrievalError(f"Réponse inattendue du service Azure OpenAI. Détails: {response.text}", status=502)
+        return [np.asarray(item["embedding"], dtype=np.float32) for item in data]
+
+
+# Backends d'index
+class DocumentRegistry:
+    """Liste des documents (id -> nom) indexés pour chaque modèle, persistée sur disque"""
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self.lock = threading.Lock()
+
+    def _path(self, model_id):
+        return os.path.join(self.index_dir, f"{os.path.basename(model_id)}.documents.json")
+
+    def _read(self, model_id):
+        with open(self._path(model_id), "r") as f:
+            return json.load(f)
+
+    def _write(self, model_id, documents):
+        with open(self._path(model_id), "w") as f:
+            json.dump(documents, f)
+
+    def exists(self, model_id):
+        return os.path.exists(self._path(model_id))
+
+    def get(self, model_id):
+        with self.lock:
+            if not self.exists(model_id):
+                return {}
+            return self._read(model_id)
+
+    def create(self, model_id, documents=None):
+        with self.lock:
+            if not self.exists(model_id):
+                self._write(model_id, documents or {})
+
+    def add(self, model_id, names):
+        with self.lock:
+            documents = self._read(model_id) if self.exists(model_id) else {}
+            documents.update(names)
+            self._write(model_id, documents)
+
+    def remove(self, model_id, doc_ids):
+        with self.lock:
+            if not self.exists(model_id):
+                return
+            documents = self._read(model_id)
+            for doc_id in doc_ids:
+                documents.pop(doc_id, None)
+            self._write(model_id, documents)
+
+    def drop(self, model_id):
+        with self.lock:
+            if self.exists(model_id):
+                os.remove(self._path(model_id))
+
+
+class AzureSearchBackend:
+    """Index distant Azure Cognitive Search.
+
+    L'index Azure n'a pas de champ model_id : les documents de chaque modèle
+    sont suivis dans un registre local et la recherche est filtrée sur leurs ids.
+    """
+
+    # Nombre maximal d'actions par requête d'indexation Azure
+    BATCH_SIZE = 1000
+
+    def __init__(self, index_dir=RETRIEVAL_INDEX_DIR):
+        os.makedirs(index_dir, exist_ok=True)
+        self.registry = DocumentRegistry(index_dir)
+
+    def _headers(self):
+        return {
+            "Content-Type": "application/json",
+            "api-key": AZURE_SEARCH_KEY
+        }
+
+    def _url(self, operation):
+        return f"{AZURE_SEARCH_ENDPOINT}/indexes/{AZURE_SEARCH_INDEX}/docs/{operation}?api-version={AZURE_SEARCH_API_VERSION}"
+
+    def _post(self, operation, payload):
+        try:
+            return requests.post(self._url(operation), headers=self._headers(), json=payload, timeout=AZURE_SEARCH_TIMEOUT)
+        except requests.exceptions.Timeout:
+            raise RetrievalError("Le service Azure Cognitive Search n'a pas répondu à temps. Réessayez plus tard.", status=504)
+        except requests.exceptions.ConnectionError:
+            raise RetrievalError(f"Impossible de se connecter au service Azure Cognitive Search. Vérifiez votre connexion internet et l'URL du point de terminaison ({AZURE_SEARCH_ENDPOINT}).", status=502)
+
+    def _scan_ids(self):
+        """Parcourir tous les ids de l'index Azure, par pages triées sur l'id.
+
+        La pagination repose sur un curseur (id > dernier id lu) et non sur `skip`,
+        instable sans tri et plafonné à 100 000 documents par Azure.
+        """
+        last_id = None
+        while True:
+            payload = {"search": "*", "select": "id", "orderby": "id", "top": self.BATCH_SIZE}
+            if last_id is not None:
+                payload["filter"] = "id gt '{}'".format(last_id.replace("'", "''"))
+            response = self._post("search", payload)
+            if response.status_code != 200:
+                raise RetrievalError(f"Erreur lors du parcours de l'index Azure Search (code {response.status_code}). Détails: {response.text}", status=502)
+            results = response.json().get("value", [])
+            for result in results:
+                yield result["id"]
+            if len(results) < self.BATCH_SIZE:
+                return
+            last_id = results[-1]["id"]
+
+    def backfill_registries(self, model_ids):
+        """Reconstruire, en un seul parcours de l'index, le registre des modèles créés avant lui.
+
+        Les ids de documents sont préfixés par l'id du modèle (`<model_id>_...`).
+        """
+        missing = {model_id for model_id in model_ids if not self.registry.exists(model_id)}
+        if not missing:
+            return
+        found = {model_id: {} for model_id in missing}
+        for doc_id in self._scan_ids():
+            model_id = doc_id.split("_", 1)[0]
+            if model_id in found:
+                found[model_id][doc_id] = doc_id
+        for model_id, documents in found.items():
+            # Fusion : des documents ont pu être ajoutés au modèle pendant le parcours
+            self.registry.add(model_id, documents)
+        logger.info("Registre reconstruit pour %s modèle(s) existant(s)", len(found))
+
+    def start_backfill(self, model_ids, retry_delay=60):
+        """Lancer la reconstruction des registres en arrière-plan, réessayée jusqu'au succès"""
+        def run():
+            while True:
+                try:
+                    self.backfill_registries(model_ids)
+                    return
+                except Exception:
+                    logger.exception("Échec de la reconstruction des registres, nouvel essai dans %s s", retry_delay)
+                    time.sleep(retry_delay)
+        threading.Thread(target=run, name="registry-backfill", daemon=True).start()
+
+    def _documents(self, model_id):
+        if not self.registry.exists(model_id):
+            # Modèle antérieur au registre, pas encore migré : une recherche non
+            # filtrée renverrait les documents des autres modèles
+            raise RetrievalError("Migration de l'index de ce modèle en cours. Réessayez dans quelques instants.", status=503)
+        return self.registry.get(model_id)
+
+    def _index_actions(self, actions):
+        """Envoyer des actions d'indexation par lots ; retourne les ids traités et les échecs (id -> message)"""
+        succeeded = []
+        failed = {}
+        for start in range(0, len(actions), self.BATCH_SIZE):
+            response = self._post("index", {"value": actions[start:start + self.BATCH_SIZE]})
+            if response.status_code not in [200, 201, 207]:
+                raise RetrievalError(f"Erreur lors de l'indexation dans Azure Search (code {response.status_code}): Vérifiez que l'index '{AZURE_SEARCH_INDEX}' existe et qu'il contient bien le champ 'embedding'. Détails: {response.text}", status=502)
+            # Un code 207 signale un succès partiel : le statut de chaque document est dans la réponse
+            for result in response.json().get("value", []):
+                if result.get("status"):
+                    succeeded.append(result["key"])
+                else:
+                    failed[result["key"]] = result.get("errorMessage") or f"code {result.get('statusCode')}"
+        return succeeded, failed
+
+    @staticmethod
+    def _raise_failures(operation, failed):
+        details = "; ".join(f"{doc_id}: {message}" for doc_id, message in failed.items())
+        raise RetrievalError(f"Échec de {operation} de {len(failed)} document(s) dans Azure Search. Détails: {details}", status=502)
+
+    def create(self, model_id):
+        self.registry.create(model_id)
+
+    def add_many(self, model_id, documents):
+        # Adapté à la structure réelle de l'index
+        actions = [
+            {"@search.action": "upload", "id": doc_id, "content": content, "embedding": np.asarray(embedding).tolist()}
+            for doc_id, _, content, embedding in documents
+        ]
+        names = {doc_id: name for doc_id, name, _, _ in documents}
+
+        succeeded, failed = self._index_actions(actions)
+        self.registry.add(model_id, {doc_id: names[doc_id] for doc_id in succeeded})
+        if failed:
+            self._raise_failures("l'enregistrement", failed)
+
+    def search(self, model_id, query_embedding, top):
+        doc_ids = list(self._documents(model_id))
+        if not doc_ids:
+            return []
+
+        # Adapté à la structure réelle de l'index : pas de champ model_id,
+        # la recherche est limitée aux documents du modèle
+        payload = {
+            "vectorQueries": [
+                {
+                    "kind": "vector",
+                    "vector": np.asarray(query_embedding).tolist(),
+                    "fields": "embedding",
+                    "k": top
+                }
+            ],
+            "select": "content",
+            "filter": f"search.in(id, '{','.join(doc_ids)}', ',')",
+            "vectorFilterMode": "preFilter"
+        }
+
+        response = self._post("search", payload)
+        if response.status_code != 200:
+            raise RetrievalError(f"Erreur lors de la recherche dans Azure Search (code {response.status_code}): Vérifiez que l'index est correctement configuré pour les recherches vectorielles. Détails: {response.text}", status=502)
+        return [result["content"] for result in response.json().get("value", [])]
+
+    def documents(self, model_id):
+        return self._documents(model_id)
+
+    def delete(self, model_id, doc_ids):
+        actions = [{"@search.action": "delete", "id": doc_id} for doc_id in doc_ids]
+        succeeded, failed = self._index_actions(actions)
+        # Seuls les documents effectivement supprimés sortent du registre
+        self.registry.remove(model_id, succeeded)
+        if failed:
+            self._raise_failures("la suppression", failed)
+
+    def drop(self, model_id):
+        doc_ids = list(self._documents(model_id))
+        self.delete(model_id, doc_ids)
+        self.registry.drop(model_id)
+        return len(doc_ids)
+
+
+Segment = namedtuple("Segment", ["seq", "ids", "names", "contents", "matrix", "alive"])
+
+IndexState = namedtuple("IndexState", ["segments", "next_seq"])
+
+EMPTY_STATE = IndexState((), 0)
+
+
+class VectorIndex:
+    """Index vectoriel en mémoire pour un modèle, persisté sur disque.
+
+    Les recherches lisent un instantané immuable de l'index et ne prennent
+    jamais de verrou ; seules les écritures sont sérialisées.
+
+    Sur disque, chaque ajout écrit un nouveau segment (`<index>.<n>.npz`) sans
+    toucher aux précédents, et un petit manifeste (`<index>.manifest.json`)
+    liste les segments et les lignes supprimées (tombstones). Une suppression ne
+    réécrit que le manifeste ; seule la compaction fusionne les segments.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = EMPTY_STATE
+        self.dropped = False
+        self._load()
+
+    def _manifest_path(self):
+        return f"{self.path}.manifest.json"
+
+    def _segment_path(self, seq):
+        return f"{self.path}.{seq}.npz"
+
+    def _load(self):
+        if not os.path.exists(self._manifest_path()):
+            return
+        with open(self._manifest_path(), "r") as f:
+            manifest = json.load(f)
+        segments = []
+        for seq in manifest["segments"]:
+            with np.load(self._segment_path(seq)) as data:
+                meta = json.loads(str(data["meta"]))
+                alive = np.ones(len(meta["ids"]), dtype=bool)
+                alive[manifest["deleted"].get(str(seq), [])] = False
+                segments.append(Segment(seq, meta["ids"], meta["names"], meta["contents"], data["matrix"], alive))
+        self.state = IndexState(tuple(segments), manifest["next"])
+
+    def _write_segment(self, segment):
+        meta = json.dumps({"ids": segment.ids, "names": segment.names, "contents": segment.contents})
+        with open(self._segment_path(segment.seq), "wb") as f:
+            np.savez(f, meta=np.array(meta), matrix=segment.matrix)
+
+    def _save_manifest(self, state):
+        # Écriture dans un fichier temporaire puis remplacement : un arrêt brutal
+        # laisse soit l'ancien manifeste, soit le nouveau, jamais un mélange des deux
+        manifest = {
+            "segments": [segment.seq for segment in state.segments],
+            "deleted": {str(segment.seq): np.flatnonzero(~segment.alive).tolist() for segment in state.segments if not segment.alive.all()},
+            "next": state.next_seq,
+        }
+        tmp_path = f"{self._manifest_path()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._manifest_path())
+
+    def _remove_segments(self, segments):
+        for segment in segments:
+            if os.path.exists(self._segment_path(segment.seq)):
+                os.remove(self._segment_path(segment.seq))
+
+    def _check_not_dropped(self):
+        if self.dropped:
+            raise RetrievalError("Ce modèle a été supprimé.", status=409)
+
+    def add_many(self, documents):
+        """Ajouter des documents (doc_id, name, content, embedding) dans un nouveau segment"""
+        if not documents:
+            return
+        vectors = np.asarray([embedding for _, _, _, embedding in documents], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        with self.lock:
+            self._check_not_dropped()
+            state = self.state
+            segment = Segment(
+                state.next_seq,
+                [doc_id for doc_id, _, _, _ in documents],
+                [name for _, name, _, _ in documents],
+                [content for _, _, content, _ in documents],
+                vectors,
+                np.ones(len(documents), dtype=bool)
+            )
+            # Le segment n'est visible qu'une fois référencé par le manifeste
+            self._write_segment(segment)
+            state = IndexState(state.segments + (segment,), state.next_seq + 1)
+            self._save_manifest(state)
+            self.state = state
+
+    def delete(self, doc_ids):
+        """Marquer des documents comme supprimés ; seul le manifeste est réécrit"""
+        doc_ids = set(doc_ids)
+        with self.lock:
+            self._check_not_dropped()
+            segments = []
+            changed = False
+            for segment in self.state.segments:
+                rows = [i for i, doc_id in enumerate(segment.ids) if doc_id in doc_ids and segment.alive[i]]
+                if rows:
+                    alive = segment.alive.copy()
+                    alive[rows] = False
+                    segment = segment._replace(alive=alive)
+                    changed = True
+                segments.append(segment)
+            if not changed:
+                return
+            state = self.state._replace(segments=tuple(segments))
+            self._save_manifest(state)
+            self.state = state
+
+    def segment_count(self):
+        return len(self.state.segments)
+
+    def tombstone_ratio(self):
+        segments = self.state.segments
+        total = sum(len(segment.ids) for segment in segments)
+        if not total:
+            return 0.0
+        return 1 - sum(int(segment.alive.sum()) for segment in segments) / total
+
+    def compact(self):
+        """Fusionner les segments en un seul, sans les documents supprimés.
+
+        Le segment fusionné est écrit hors verrou puis le manifeste est échangé ;
+        si une écriture a eu lieu entre-temps, la compaction recommence. Un index
+        supprimé entre-temps n'est jamais réécrit.
+        """
+        while True:
+            with self.lock:
+                if self.dropped:
+                    return 0
+                state = self.state
+                seq = state.next_seq
+                # Réserver le numéro du segment fusionné
+                self.state = state = state._replace(next_seq=seq + 1)
+
+            kept = [(segment, np.flatnonzero(segment.alive)) for segment in state.segments]
+            ids = [segment.ids[i] for segment, rows in kept for i in rows]
+            merged = Segment(
+                seq,
+                ids,
+                [segment.names[i] for segment, rows in kept for i in rows],
+                [segment.contents[i] for segment, rows in kept for i in rows],
+                np.vstack([segment.matrix[rows] for segment, rows in kept]) if ids else None,
+                np.ones(len(ids), dtype=bool)
+            )
+            if merged.ids:
+                self._write_segment(merged)
+
+            with self.lock:
+                if self.dropped or self.state is not state:
+                    self._remove_segments([merged])
+                    if self.dropped:
+                        return 0
+                    continue
+                compacted = IndexState((merged,) if merged.ids else (), state.next_seq)
+                self._save_manifest(compacted)
+                self.state = compacted
+                self._remove_segments(state.segments)
+                return sum(len(segment.ids) for segment in state.segments) - len(merged.ids)
+
+    def documents(self):
+        return {
+            doc_id: name
+            for segment in self.state.segments
+            for doc_id, name, alive in zip(segment.ids, segment.names, segment.alive) if alive
+        }
+
+    def search(self, query_embedding, top):
+        segments = self.state.segments
+        count = sum(int(segment.alive.sum()) for segment in segments)
+        if not count:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        scores = np.concatenate([np.where(segment.alive, segment.matrix @ query, -np.inf) for segment in segments])
+        contents = [content for segment in segments for content in segment.contents]
+        top = min(top, count)
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        return [contents[i] for i in best]
+
+    def drop(self):
+        """Vider l'index et supprimer ses fichiers ; retourne le nombre de documents retirés"""
+        with self.lock:
+            count = len(self.documents())
+            segments = self.state.segments
+            self.dropped = True
+            self.state = EMPTY_STATE
+            # Le manifeste d'abord : un arrêt en cours de route ne laisse que des segments orphelins
+            for path in (self._manifest_path(), f"{self._manifest_path()}.tmp"):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._remove_segments(segments)
+            return count
+
+
+class LocalBackend:
+    """Index vectoriels locaux, un par modèle, chargés une seule fois par machine.
+
+    Quand la proportion de documents supprimés d'un index dépasse
+    COMPACTION_THRESHOLD, ou que ses segments dépassent MAX_INDEX_SEGMENTS,
+    sa compaction est lancée en arrière-plan.
+    """
+
+    def __init__(self, index_dir=RETRIEVAL_INDEX_DIR, compaction_threshold=COMPACTION_THRESHOLD, max_segments=MAX_INDEX_SEGMENTS):
+        self.index_dir = index_dir
+        os.makedirs(index_dir, exist_ok=True)
+        self.indexes = {}
+        self.lock = threading.Lock()
+        self.compaction_threshold = compaction_threshold
+        self.max_segments = max_segments
+        self.compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-compaction")
+        self.pending_compactions = set()
+
+    def _index(self, model_id):
+        with self.lock:
+            index = self.indexes.get(model_id)
+            if index is None:
+                index = VectorIndex(os.path.join(self.index_dir, os.path.basename(model_id)))
+                self.indexes[model_id] = index
+            return index
+
+    def _schedule_compaction(self, model_id, index):
+        with self.lock:
+            if model_id in self.pending_compactions:
+                return
+            self.pending_compactions.add(model_id)
+        self.compactor.submit(self._compact, model_id, index)
+
+    def _compact(self, model_id, index):
+        with self.lock:
+            self.pending_compactions.discard(model_id)
+        try:
+            removed = index.compact()
+            logger.info("Compaction de l'index %s : %s documents retirés", model_id, removed)
+        except Exception:
+            logger.exception("Échec de la compaction de l'index %s", model_id)
+
+    def _maybe_compact(self, model_id, index):
+        if index.tombstone_ratio() > self.compaction_threshold or index.segment_count() > self.max_segments:
+            self._schedule_compaction(model_id, index)
+
+    def create(self, model_id):
+        # Un index local vide ne retourne aucun résultat : rien à préparer
+        pass
+
+    def add_many(self, model_id, documents):
+        index = self._index(model_id)
+        index.add_many(documents)
+        self._maybe_compact(model_id, index)
+
+    def search(self, model_id, query_embedding, top):
+        return self._index(model_id).search(query_embedding, top)
+
+    def documents(self, model_id):
+        return self._index(model_id).documents()
+
+    def delete(self, model_id, doc_ids):
+        index = self._index(model_id)
+        index.delete(doc_ids)
+        self._maybe_compact(model_id, index)
+
+    def drop(self, model_id):
+        # Le verrou est gardé jusqu'à la suppression des fichiers : un accès
+        # concurrent au modèle ne peut pas recharger l'index en cours de suppression
+        with self.lock:
+            index = self.indexes.pop(model_id, None)
+            if index is None:
+                index = VectorIndex(os.path.join(self.index_dir, os.path.basename(model_id)))
+            return index.drop()
+
+
+BACKENDS = {
+    "azure": AzureSearchBackend,
+    "local": LocalBackend,
+}
+
+
+# Serveur HTTP
+class RetrievalService:
+    """Opérations exposées par le service"""
+
+    def __init__(self, backend, embeddings):
+        self.backend = backend
+        self.embeddings = embeddings
+
+    def embed(self, payload):
+        return {"embeddings": [embedding.tolist() for embedding in self.embeddings.embed(payload["texts"])]}
+
+    def create_model(self, payload):
+        self.backend.create(payload["model_id"])
+        return {"created": payload["model_id"]}
+
+    def index(self, payload):
+        documents = payload["documents"]
+        embeddings = self.embeddings.embed([document["content"] for document in documents], use_cache=False)
+        self.backend.add_many(payload["model_id"], [
+            (document["doc_id"], document.get("name", document["doc_id"]), document["content"], embedding)
+            for document, embedding in zip(documents, embeddings)
+        ])
+        return {"indexed": len(documents)}
+
+    def search(self, payload):
+        query_embedding = self.embeddings.embed([payload["query"]])[0]
+        results = self.backend.search(payload["model_id"], query_embedding, payload.get("top", 3))
+        return {"results": results}
+
+    def documents(self, payload):
+        documents = self.backend.documents(payload["model_id"])
+        return {"documents": [{"id": doc_id, "name": name} for doc_id, name in documents.items()]}
+
+    def delete_documents(self, payload):
+        self.backend.delete(payload["model_id"], payload["doc_ids"])
+        return {"deleted": len(payload["doc_ids"])}
+
+    def delete_model(self, payload):
+        return {"deleted": self.backend.drop(payload["model_id"])}
+
+
+class RetrievalRequestHandler(BaseHTTPRequestHandler):
+    # Une requête par connexion : une connexion inactive ne doit pas
+    # monopoliser un worker du pool
+    protocol_version = "HTTP/1.0"
+
+    # Route -> (opération, champs obligatoires du corps JSON)
+    routes = {
+        "/embed": ("embed", ["texts"]),
+        "/create_model": ("create_model", ["model_id"]),
+        "/index": ("index", ["model_id", "documents"]),
+        "/search": ("search", ["model_id", "query"]),
+        "/documents": ("documents", ["model_id"]),
+        "/delete_documents": ("delete_documents", ["model_id", "doc_ids"]),
+        "/delete_model": ("delete_model", ["model_id"]),
+    }
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "backend": RETRIEVAL_BACKEND})
+        else:
+            self._send_json(404, {"error": f"Route inconnue: {self.path}"})
+
+    def do_POST(self):
+        route = self.routes.get(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+
+        if route is None:
+            self._send_json(404, {"error": f"Route inconnue: {self.path}"})
+            return
+        operation, required = route
+
+        try:
+            payload = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            self._send_json(400, {"error": f"Requête invalide: {str(e)}"})
+            return
+        missing = [field for field in required if field not in payload] if isinstance(payload, dict) else required
+        if missing:
+            self._send_json(400, {"error": f"Requête invalide: champs manquants {', '.join(missing)}"})
+            return
+
+        try:
+            result = getattr(self.server.service, operation)(payload)
+        except RetrievalError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            logger.exception("Erreur inattendue sur %s", self.path)
+            self._send_json(500, {"error": f"Erreur inattendue: {str(e)}"})
+        else:
+            self._send_json(200, result)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class PooledHTTPServer(HTTPServer):
+    """Serveur HTTP qui traite les connexions dans un pool de workers borné"""
+
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, service, workers=RETRIEVAL_WORKERS):
+        super().__init__(server_address, handler_class)
+        self.service = service
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="retrieval-worker")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def check_config(backend=RETRIEVAL_BACKEND):
+    """Retourner la liste des erreurs de configuration du service"""
+    config_errors = []
+    if backend not in BACKENDS:
+        config_errors.append(f"Backend de recherche inconnu: {backend}. Valeurs possibles: {', '.join(BACKENDS)}")
+    if not AZURE_EMBEDDING_ENDPOINT or not AZURE_EMBEDDING_API_KEY:
+        config_errors.append("Azure Embedding n'est pas configuré correctement. Vérifiez les variables AZURE_EMBEDDING_ENDPOINT et AZURE_EMBEDDING_API_KEY dans le fichier .env")
+    if backend == "azure" and (not AZURE_SEARCH_ENDPOINT or not AZURE_SEARCH_KEY or not AZURE_SEARCH_INDEX):
+        config_errors.append("Azure Cognitive Search n'est pas configuré correctement. Vérifiez les variables AZURE_SEARCH_ENDPOINT, AZURE_SEARCH_KEY et AZURE_SEARCH_INDEX dans le fichier .env")
+    return config_errors
+
+
+def known_model_ids(models_dir=RETRIEVAL_MODELS_DIR):
+    """Ids des modèles enregistrés par l'application (`<id>.json`)"""
+    if not os.path.isdir(models_dir):
+        return []
+    return [filename[:-len(".json")] for filename in os.listdir(models_dir) if filename.endswith(".json")]
+
+
+def create_server(host=RETRIEVAL_SERVICE_HOST, port=RETRIEVAL_SERVICE_PORT, backend=RETRIEVAL_BACKEND, workers=RETRIEVAL_WORKERS):
+    """Construire le serveur de recherche avec le backend demandé"""
+    service = RetrievalService(BACKENDS[backend](), EmbeddingService())
+    if backend == "azure":
+        service.backend.start_backfill(known_model_ids())
+    return PooledHTTPServer((host, port), RetrievalRequestHandler, service, workers=workers)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    config_errors = check_config()
+    if config_errors:
+        for error in config_errors:
+            logger.error(error)
+        raise SystemExit(1)
+
+    server = create_server()
+    logger.info("Service de recherche (%s) à l'écoute sur http://%s:%s avec %s workers",
+                RETRIEVAL_BACKEND, RETRIEVAL_SERVICE_HOST, RETRIEVAL_SERVICE_PORT, RETRIEVAL_WORKERS)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+import threading
+
+import numpy as np
+import pytest
+
+import retrieval_service
+from conversation_memory import ConversationMemory
+from retrieval_service import AzureSearchBackend, LocalBackend, RetrievalError
+
+
+def make_documents(count, dim=4):
+    documents = []
+    for i in range(count):
+        embedding = np.zeros(dim)
+        embedding[i % dim] = 1
+        documents.append((f"d{i}", f"doc{i}.pdf", f"content {i}", embedding.tolist()))
+    return documents
+
+
+def indexed_ids(index):
+    return [doc_id for segment in index.state.segments for doc_id in segment.ids]
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = LocalBackend(str(tmp_path), compaction_threshold=0.2)
+    yield backend
+    backend.compactor.shutdown(wait=True)
+
+
+def test_delete_tombstones_documents(backend):
+    backend.add_many("m", make_documents(10))
+    backend.delete("m", ["d1"])
+
+    index = backend._index("m")
+    assert index.tombstone_ratio() == pytest.approx(0.1)
+    assert "d1" not in backend.documents("m")
+    assert "content 1" not in backend.search("m", [0, 1, 0, 0], 10)
+    # Sous le seuil : les vecteurs restent en place
+    assert len(indexed_ids(index)) == 10
+
+
+def test_compaction_removes_tombstones(tmp_path, backend):
+    backend.add_many("m", make_documents(10))
+    backend.delete("m", ["d0", "d1", "d2"])
+    backend.compactor.shutdown(wait=True)
+
+    index = backend._index("m")
+    assert indexed_ids(index) == ["d3", "d4", "d5", "d6", "d7", "d8", "d9"]
+    assert index.tombstone_ratio() == 0
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["m.1.npz", "m.manifest.json"]
+    assert LocalBackend(str(tmp_path)).documents("m") == {f"d{i}": f"doc{i}.pdf" for i in range(3, 10)}
+
+
+def test_drop_removes_index(tmp_path, backend):
+    backend.add_many("m", make_documents(5))
+
+    assert backend.drop("m") == 5
+    assert backend.documents("m") == {}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_pending_compaction_does_not_resurrect_dropped_index(tmp_path):
+    # Seuil inatteignable : la compaction est déclenchée à la main, après la suppression
+    backend = LocalBackend(str(tmp_path), compaction_threshold=1.0)
+    backend.add_many("m", make_documents(10))
+    index = backend._index("m")
+    backend.delete("m", ["d0", "d1", "d2"])
+
+    backend.drop("m")
+    backend._compact("m", index)
+
+    assert list(tmp_path.iterdir()) == []
+    assert LocalBackend(str(tmp_path)).documents("m") == {}
+
+
+def test_index_access_waits_for_drop(tmp_path, backend):
+    backend.add_many("m", make_documents(3))
+    index = backend._index("m")
+    started, release = threading.Event(), threading.Event()
+    drop = index.drop
+
+    def slow_drop():
+        started.set()
+        release.wait(5)
+        return drop()
+    index.drop = slow_drop
+
+    dropper = threading.Thread(target=backend.drop, args=("m",))
+    dropper.start()
+    started.wait(5)
+    reloaded = []
+    reader = threading.Thread(target=lambda: reloaded.append(backend._index("m")))
+    reader.start()
+    reader.join(0.1)
+    # L'index ne peut pas être rechargé depuis des fichiers en cours de suppression
+    assert reader.is_alive()
+
+    release.set()
+    dropper.join()
+    reader.join()
+    assert reloaded[0] is not index
+    assert reloaded[0].documents() == {}
+    backend.delete("m", ["d0"])
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_writes_to_dropped_index_are_refused(tmp_path, backend):
+    backend.add_many("m", make_documents(3))
+    index = backend._index("m")
+    backend.drop("m")
+
+    with pytest.raises(RetrievalError):
+        index.add_many(make_documents(1))
+    with pytest.raises(RetrievalError):
+        index.delete(["d0"])
+    assert list(tmp_path.iterdir()) == []
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+        self.text = str(body)
+
+    def json(self):
+        return self.body
+
+
+def test_azure_delete_keeps_failed_ids_in_registry(tmp_path, monkeypatch):
+    backend = AzureSearchBackend(str(tmp_path))
+    backend.registry.create("m", {"m_1": "a.pdf", "m_2": "b.pdf"})
+
+    def post(operation, payload):
+        return FakeResponse(207, {"value": [
+            {"key": "m_1", "status": True, "statusCode": 200},
+            {"key": "m_2", "status": False, "statusCode": 503, "errorMessage": "indisponible"},
+        ]})
+    monkeypatch.setattr(backend, "_post", post)
+
+    with pytest.raises(RetrievalError, match="m_2"):
+        backend.delete("m", ["m_1", "m_2"])
+    assert backend.documents("m") == {"m_2": "b.pdf"}
+
+
+def test_azure_backfill_pages_with_cursor(tmp_path, monkeypatch):
+    backend = AzureSearchBackend(str(tmp_path))
+    monkeypatch.setattr(AzureSearchBackend, "BATCH_SIZE", 2)
+    backend.registry.create("done", {"done_1": "a.pdf"})
+    pages = [["done_1", "legacy_1"], ["legacy_2", "other_1"], []]
+    sent = []
+
+    def post(operation, payload):
+        sent.append(payload)
+        return FakeResponse(200, {"value": [{"id": doc_id} for doc_id in pages[len(sent) - 1]]})
+    monkeypatch.setattr(backend, "_post", post)
+
+    backend.backfill_registries(["done", "legacy", "empty"])
+
+    assert [payload.get("filter") for payload in sent] == [None, "id gt 'legacy_1'", "id gt 'other_1'"]
+    assert all(payload["orderby"] == "id" and "skip" not in payload for payload in sent)
+    assert backend.documents("legacy") == {"legacy_1": "legacy_1", "legacy_2": "legacy_2"}
+    assert backend.documents("empty") == {}
+    assert backend.documents("done") == {"done_1": "a.pdf"}
+
+
+def test_azure_search_waits_for_backfill(tmp_path, monkeypatch):
+    backend = AzureSearchBackend(str(tmp_path))
+    monkeypatch.setattr(backend, "_post", lambda operation, payload: pytest.fail("parcours de l'index"))
+
+    with pytest.raises(RetrievalError) as error:
+        backend.search("legacy", [1.0], 3)
+    assert error.value.status == 503
+
+
+def test_azure_search_on_empty_model_is_scoped(tmp_path, monkeypatch):
+    backend = AzureSearchBackend(str(tmp_path))
+    backend.create("m")
+    monkeypatch.setattr(backend, "_post", lambda operation, payload: pytest.fail("recherche non filtrée"))
+
+    assert backend.search("m", [1.0], 3) == []
+
+
+def test_writes_only_touch_new_segment_and_manifest(tmp_path):
+    backend = LocalBackend(str(tmp_path), compaction_threshold=1.0)
+    backend.add_many("m", make_documents(2))
+    first_segment = (tmp_path / "m.0.npz").stat().st_mtime_ns
+    backend.add_many("m", make_documents(4)[2:])
+    backend.delete("m", ["d0"])
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["m.0.npz", "m.1.npz", "m.manifest.json"]
+    assert (tmp_path / "m.0.npz").stat().st_mtime_ns == first_segment
+    assert retrieval_service.VectorIndex(str(tmp_path / "m")).documents() == {f"d{i}": f"doc{i}.pdf" for i in range(1, 4)}
+
+
+def test_segments_are_merged_above_limit(tmp_path):
+    backend = LocalBackend(str(tmp_path), max_segments=2)
+    for i in range(3):
+        backend.add_many("m", [make_documents(3)[i]])
+    backend.compactor.shutdown(wait=True)
+
+    assert backend._index("m").segment_count() == 1
+    assert backend.search("m", [0, 0, 1, 0], 1) == ["content 2"]
+
+
+class FakeEmbeddings(retrieval_service.EmbeddingService):
+    """Service d'embedding dont les appels Azure sont simulés"""
+
+    def __init__(self, fail=None, **kwargs):
+        self.calls = []
+        self.fail = fail or {}
+        super().__init__(batch_wait=0.05, deadline=5, **kwargs)
+
+    def _request_embeddings(self, texts):
+        self.calls.append(list(texts))
+        for text in texts:
+            if text in self.fail:
+                raise RetrievalError("refusé", status=self.fail[text])
+        return [np.full(2, float(len(text)), dtype=np.float32) for text in texts]
+
+
+def test_embed_keeps_order_with_cache_hits():
+    embeddings = FakeEmbeddings()
+    embeddings.embed(["bb"])
+
+    result = embeddings.embed(["a", "bb", "cccc"])
+
+    assert [embedding[0] for embedding in result] == [1, 2, 4]
+    assert all(embedding.dtype == np.float32 for embedding in result)
+    assert embeddings.calls == [["bb"], ["a", "cccc"]]
+
+
+def test_indexed_documents_bypass_cache():
+    embeddings = FakeEmbeddings()
+    embeddings.embed(["document"], use_cache=False)
+    embeddings.embed(["document"], use_cache=False)
+
+    assert len(embeddings.calls) == 2
+    assert len(embeddings.cache) == 0
+
+
+def test_rejected_input_is_isolated_from_batch():
+    embeddings = FakeEmbeddings(fail={"bad": 400})
+    # Un seul appel à embed() : les trois textes partent dans le même lot
+    with pytest.raises(RetrievalError) as error:
+        embeddings.embed(["ok", "bad", "fine"])
+    assert error.value.status == 400
+    embeddings.executor.shutdown(wait=True)
+
+    assert embeddings.calls[0] == ["ok", "bad", "fine"]
+    assert sorted(embeddings.calls[1:]) == [["bad"], ["fine"], ["ok"]]
+    # Les entrées valides du lot ont été calculées et mises en cache
+    assert set(embeddings.cache) == {embeddings._key("ok"), embeddings._key("fine")}
+
+
+def test_throttled_batch_is_not_split():
+    embeddings = FakeEmbeddings(fail={"b": 429})
+
+    with pytest.raises(RetrievalError) as error:
+        embeddings.embed(["a", "b", "c"])
+
+    assert error.value.status == 429
+    assert embeddings.calls == [["a", "b", "c"]]
+
+
+def make_memory(max_turns=4):
+    return ConversationMemory(max_turns=max_turns, summary_max_tokens=300)
+
+
+def summarize(messages, max_tokens):
+    return "résumé"
+
+
+def fail(messages, max_tokens):
+    return None
+
+
+def test_memory_folds_half_window_when_full():
+    memory = make_memory()
+    for i in range(4):
+        memory.add_turn(f"q{i}", f"r{i}", lambda messages, max_tokens: pytest.fail("résumé prématuré"))
+    memory.add_turn("q4", "r4", summarize)
+
+    assert memory.summary == "résumé"
+    assert list(memory.turns) == [("q3", "r3"), ("q4", "r4")]
+
+
+def test_memory_keeps_turns_when_summary_fails():
+    memory = make_memory()
+    for i in range(5):
+        memory.add_turn(f"q{i}", f"r{i}", fail)
+
+    assert memory.summary == ""
+    assert len(memory.turns) == 5
+
+
+def test_memory_caps_window_with_fallback_summary():
+    memory = make_memory()
+    for i in range(9):
+        memory.add_turn(f"q{i}", "r" * 1000 if i == 0 else f"r{i}", fail)
+
+    assert [question for question, _ in memory.turns] == [f"q{i}" for i in range(1, 9)]
+    # L'échange sorti de la fenêtre n'est pas perdu, et sa réponse est tronquée
+    assert "q0" in memory.summary
+    assert len(memory.summary) < 400
+
+    memory.add_turn("q9", "r9", summarize)
+    assert memory.summary == "résumé"
+
+
+def test_forgotten_turn_stays_out_of_prompt():
+    memory = make_memory()
+    memory.add_turn("q0", "r0", summarize)
+    memory.add_turn("erreur", "Désolé, une erreur est survenue", summarize, remember=False)
+
+    assert len(memory.messages) == 4
+    assert memory.prompt_messages("système", "q1") == [
+        {"role": "system", "content": "système"},
+        {"role": "user", "content": "q0"},
+        {"role": "assistant", "content": "r0"},
+        {"role": "user", "content": "q1"},
+    ]
+
+
+def test_standalone_query_without_history():
+    memory = make_memory()
+    assert memory.standalone_query("Quels symptômes ?", lambda messages, max_tokens: pytest.fail("reformulation")) == "Quels symptômes ?"